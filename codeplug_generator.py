@@ -16,32 +16,81 @@
 import logging
 import argparse
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 import csv
-import json
+import ijson
 import sys
 import os
+import pickle
+import re
 import time
+import itertools
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 # Keep track of used channel names to ensure uniqueness
 # Declare the global variable to store channel names per state
 channels_by_state = defaultdict(list)
 channels_by_network = defaultdict(list)
 # Initialize the used_channel_names set globally
 used_channel_names = set()
+# Last numeric suffix handed out for each truncated base name
+base_suffix = defaultdict(int)
+# Default networks, matched anywhere in the lowercased network name
+NET_RE = re.compile(r'bm|bran|tgif|adn|dmr-plus')
+# Channels waiting for a location lookup: (row, radioid, is_bm)
+pending_location_lookups = []
+# Share one HTTP session so all API calls reuse keep-alive connections.
+# requests already asks for gzip-compressed responses by default.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=3))
+# Channel CSV columns, in the order expected by the OpenGD77 CPS
+FIELDS = (
+    'Channel Number', 'Channel Name', 'Channel Type', 'Rx Frequency', 'Tx Frequency',
+    'Bandwidth (kHz)', 'Colour Code', 'Timeslot', 'Contact', 'TG List', 'DMR ID',
+    'TS1_TA_Tx', 'TS2_TA_Tx ID', 'RX Tone', 'TX Tone', 'Squelch', 'Power', 'Rx Only',
+    'Zone Skip', 'All Skip', 'TOT', 'VOX', 'No Beep', 'No Eco', 'APRS',
+    'Latitude', 'Longitude', 'Use location',
+)
+# Constant channel columns; map_repeater_to_csv copies this and sets the per-repeater fields
+_ROW_TEMPLATE = {
+    'Channel Type': 'Digital',  # Placeholder for now
+    'Bandwidth (kHz)': '',  # Not available in the API
+    'Timeslot': '1', # always 1 for opendm77 as it is settable by keyboard
+    'Contact': 'None',  # Trustee as contact
+    'DMR ID': 'None',
+    'TS1_TA_Tx': 'APRS+Text',  # Placeholder
+    'TS2_TA_Tx ID': 'APRS+Text',  # Placeholder
+    'RX Tone': '',  # Placeholder
+    'TX Tone': '',  # Placeholder
+    'Squelch': '',  # Placeholder
+    'Power': 'Master',  # Placeholder
+    'Rx Only': 'No',  # Placeholder
+    'Zone Skip': 'No',  # Placeholder
+    'All Skip': 'No',  # Placeholder
+    'TOT': '0',  # Placeholder
+    'VOX': 'Off',  # Placeholder
+    'No Beep': 'No',  # Placeholder
+    'No Eco': 'No',  # Placeholder
+    'APRS': 'None',  # Placeholder
+    'Latitude': 0.0,  # filled in by resolve_locations()
+    'Longitude': 0.0,
+    'Use location': 'No'
+}
 
 def download_radioid_map(url="https://radioid.net/static/map.json", local_filename='map.json'):
     """
     Downloads JSON data from the given URL and saves it to a local file named map.json.
-    Loads and returns the JSON data after saving it. If the local file exists and is less
-    than 24 hours old, it loads the data from the local file instead of downloading it.
+    Returns the marker index built from the saved file. If the local file exists and is less
+    than 24 hours old, it builds the index from the local file instead of downloading it.
+    Older local files are revalidated with the ETag saved in <local_filename>.etag, so the
+    map is only downloaded again when the server copy has changed.
 
     Args:
         url (str): The URL to download the JSON data from. Default is the RadioID map URL.
         local_filename (str): The name of the local file to save the JSON data. Default is 'map.json'.
     
     Returns:
-        dict or list: Parsed JSON data loaded from the downloaded file or from the local file.
+        dict: Marker index (see load_marker_index) or None if the map could not be loaded.
     """
     # Check if the local file exists
     if os.path.exists(local_filename):
@@ -53,53 +102,137 @@ def download_radioid_map(url="https://radioid.net/static/map.json", local_filena
         if (current_time - file_mod_time) < 24 * 3600:  # 24 hours in seconds
             print(f"Loading data from local file {local_filename} (less than 24h old)")
             try:
-                with open(local_filename, 'r') as json_file:
-                    data = json.load(json_file)
-                return data
+                return load_marker_index(local_filename)
             except Exception as e:
                 print(f"Error loading JSON from {local_filename}: {e}")
                 return None
 
-    # If the file is older than 24 hours or does not exist, download the data
-    print(f"Downloading data from {url} and saving to {local_filename}")
+    # If the file is older than 24 hours, only download it again if it changed
+    etag_filename = local_filename + '.etag'
+    headers = {}
+    if os.path.exists(local_filename) and os.path.exists(etag_filename):
+        try:
+            with open(etag_filename, 'r') as etag_file:
+                headers['If-None-Match'] = etag_file.read().strip()
+        except (OSError, ValueError) as e:
+            # Without a usable ETag just do a normal download
+            print(f"Warning: unable to read {etag_filename}, downloading the full map: {e}")
+
+    # If the file is stale or does not exist, download the data
     try:
-        response = requests.get(url)
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            with open(local_filename, 'w') as json_file:
-                json.dump(response.json(), json_file, indent=4)
-            print(f"JSON data downloaded and saved to {local_filename}")
-            
-            # Load the JSON content from the file
-            with open(local_filename, 'r') as json_file:
-                data = json.load(json_file)
-            return data
-        else:
-            print(f"Error: Unable to download data. Status code: {response.status_code}")
-            return None
+        with SESSION.get(url, headers=headers, stream=True, timeout=30) as response:
+            # The server copy has not changed, keep using the local file
+            if response.status_code == 304:
+                print(f"Map data unchanged on server, loading local file {local_filename}")
+                # Restart the 24h window; touch the cached index after the map so it stays newer
+                os.utime(local_filename)
+                index_filename = marker_index_filename(local_filename)
+                if os.path.exists(index_filename):
+                    os.utime(index_filename)
+                return load_marker_index(local_filename)
+            # Check if the request was successful
+            if response.status_code != 200:
+                print(f"Error: Unable to download data. Status code: {response.status_code}")
+                return None
+            print(f"Downloading data from {url} and saving to {local_filename}")
+            # Stream the payload to disk without holding it in memory; write to a
+            # temporary file first so a failed download never looks like a fresh map
+            partial_filename = local_filename + '.part'
+            with open(partial_filename, 'wb') as json_file:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    json_file.write(chunk)
+            os.replace(partial_filename, local_filename)
+            # Remember the ETag for the next conditional request
+            etag = response.headers.get('ETag')
+            if etag:
+                with open(etag_filename, 'w') as etag_file:
+                    etag_file.write(etag)
+            elif os.path.exists(etag_filename):
+                os.remove(etag_filename)
+        print(f"JSON data downloaded and saved to {local_filename}")
+        return load_marker_index(local_filename)
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
 
-def lookup_record_by_id(record_id, map_data):
+def marker_index_filename(local_filename):
+    """
+    Return the name of the pickled marker index kept next to a radioid map file,
+    e.g. map.index.pkl for map.json.
+    """
+    return os.path.splitext(local_filename)[0] + '.index.pkl'
+
+def load_marker_index(local_filename):
+    """
+    Return the marker index for a radioid map file, using a pickled copy of the
+    index (e.g. map.index.pkl next to map.json) when it is newer than the map,
+    so the JSON only has to be parsed again after a new download.
+
+    Args:
+        local_filename (str): The radioid map JSON file.
+
+    Returns:
+        dict: {str(locator): (longitude, latitude)} for every marker.
+    """
+    index_filename = marker_index_filename(local_filename)
+    if os.path.exists(index_filename) and os.path.getmtime(index_filename) >= os.path.getmtime(local_filename):
+        try:
+            with open(index_filename, 'rb') as index_file:
+                return pickle.load(index_file)
+        except Exception as e:
+            print(f"Error loading cached index {index_filename}, rebuilding it: {e}")
+
+    marker_index = build_marker_index(local_filename)
+    try:
+        with open(index_filename, 'wb') as index_file:
+            pickle.dump(marker_index, index_file, protocol=5)
+    except OSError as e:
+        print(f"Warning: unable to save cached index {index_filename}: {e}")
+    return marker_index
+
+def map_coordinate(value):
     """
-    Look up a record in the JSON data by a specific id and return the longitude and latitude.
+    Return a radioid map coordinate as a float if it is a JSON number, so every
+    numeric coordinate is written the same way; anything else is kept as-is.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def build_marker_index(local_filename):
+    """
+    Build an index of the radioid map markers keyed by locator (the repeater id).
+    The file is parsed incrementally so only the markers are ever held in memory.
+
+    Args:
+        local_filename (str): The radioid map JSON file.
+
+    Returns:
+        dict: {str(locator): (longitude, latitude)} for every marker.
+    """
+    marker_index = {}
+    with open(local_filename, 'rb') as json_file:
+        for marker in ijson.items(json_file, 'markers.item', use_float=True):
+            # Stringify the locator once so int/str ids compare the same; keep the
+            # first marker for a duplicated locator, as the old linear scan did
+            marker_index.setdefault(
+                str(marker.get('locator', '')),
+                (map_coordinate(marker.get('lng', 0.0)), map_coordinate(marker.get('lat', 0.0)))
+            )
+    return marker_index
+
+def lookup_record_by_id(record_id, marker_index):
+    """
+    Look up a record in the marker index by a specific id and return the longitude and latitude.
     
     Args:
         record_id (int or str): The id to search for.
-        json_data (dict or list): The loaded JSON data to search within.
+        marker_index (dict): The index returned by load_marker_index().
 
     Returns:
-        tuple: (longitude, latitude) if the record is found, or (None, None) if not found.
+        tuple: (longitude, latitude) if the record is found, or (0.0, 0.0) if not found.
     """
-    # Iterate over all records in the JSON data
-    for marker in map_data.get('markers', []):  # Assuming 'markers' contains the list of records
-        if str(marker.get('locator', '')) == str(record_id):  # Compare as string to handle int/str cases
-            lon = marker.get('lng', None)
-            lat = marker.get('lat', None)
-            return lon, lat  # Return the longitude and latitude if found
-    return 0, 0  # Return (0, 0) if no matching record is found
+    return marker_index.get(str(record_id), (0.0, 0.0))
 
 def write_zone_to_csv(output_file, max_channels=180):
     """
@@ -125,15 +258,15 @@ def write_zone_to_csv(output_file, max_channels=180):
         writer.writerow(header)
 
         # Write each state (zone) and its associated channels
-        for state, channels in channels_by_state.items():
-            # Limit channels to max_channels and pad with empty strings if there are fewer
-            row = [state] + channels[:max_channels] + [''] * (max_channels - len(channels))
-            writer.writerow(row)
-        # Write each network (zone) and its associated channels
-        for network, channels in channels_by_network.items():
-            # Limit channels to max_channels and pad with empty strings if there are fewer
-            row = [network] + channels[:max_channels] + [''] * (max_channels - len(channels))
-            writer.writerow(row)
+        # followed by each network (zone) and its associated channels
+        for zone, channels in itertools.chain(channels_by_state.items(), channels_by_network.items()):
+            # Limit channels to max_channels and pad with empty strings if there are fewer,
+            # streaming the cells instead of building intermediate lists
+            writer.writerow(itertools.chain(
+                [zone],
+                itertools.islice(channels, max_channels),
+                itertools.repeat('', max(0, max_channels - len(channels)))
+            ))
 
     print(f"Zones by state have been written to {output_file}")
     
@@ -142,8 +275,8 @@ def fetch_lat_long_with_api(repeater_id):
         # Construct the URL for the given repeater ID
         url = f"https://api.brandmeister.network/v2/device/{repeater_id}"
 
-        # Send an HTTP GET request to the API
-        response = requests.get(url, timeout=10)
+        # Send an HTTP GET request to the API over the shared session
+        response = SESSION.get(url, timeout=10)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         # Parse the JSON response
@@ -168,6 +301,51 @@ def fetch_lat_long_with_api(repeater_id):
     except requests.exceptions.RequestException as e:
         logging.error(f"HTTP request error for id='{repeater_id}': {e}")
         return 0, 0
+    except ValueError as e:
+        logging.error(f"Invalid location data for id='{repeater_id}': {e}")
+        return 0, 0
+
+def fetch_bm_device_index(url="https://api.brandmeister.network/v2/device"):
+    """
+    Fetch the full Brandmeister device list in one request and index the
+    device locations by id, so BM repeaters need no per-repeater API call.
+
+    Args:
+        url (str): The Brandmeister device list URL.
+
+    Returns:
+        dict: {str(id): (latitude, longitude)} for every listed device, with None
+        for devices that have no usable location, or None if the list could not be fetched.
+    """
+    print(f"Downloading Brandmeister device locations from {url}")
+    try:
+        response = SESSION.get(url, timeout=30)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        devices = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logging.error(f"Unable to fetch the Brandmeister device list: {e}")
+        return None
+    # Anything but a list (an error object, a paginated wrapper) is not usable
+    if not isinstance(devices, list):
+        logging.error(f"Unexpected Brandmeister device list format: {type(devices).__name__}")
+        return None
+
+    bm_index = {}
+    for device in devices:
+        if not isinstance(device, dict):
+            continue
+        try:
+            latitude = float(device.get('lat') or 0)
+            longitude = float(device.get('lng') or 0)
+        except (TypeError, ValueError):
+            latitude = longitude = 0.0
+        # Listed devices without a location are kept as None so they go straight
+        # to the radioid map instead of costing a per-repeater API call
+        if latitude == 0.0 and longitude == 0.0:
+            bm_index[str(device.get('id'))] = None
+        else:
+            bm_index[str(device.get('id'))] = (latitude, longitude)
+    return bm_index
 
 # Function to calculate Tx Frequency based on Rx Frequency and Offset
 def calculate_tx_frequency(rx_frequency, offset):
@@ -190,14 +368,15 @@ def get_unique_channel_name(base_name):
         used_channel_names.add(base_name)
         return base_name
     
-    # If the base name exists, append a number to ensure uniqueness
-    suffix = 1
-    unique_name = base_name[:15]  # Reserve space for the suffix
-    while unique_name in used_channel_names:
-        suffix_str = hex(suffix)[2:].upper()  # Remove '0x' prefix and convert to uppercase
-        # Create a new unique name by appending the suffix
+    # If the base name exists, append the next number for this base to ensure uniqueness.
+    # Bump again only if that name was already taken by another base.
+    while True:
+        base_suffix[base_name] += 1
+        suffix_str = format(base_suffix[base_name], 'X')  # Uppercase hex without '0x' prefix
+        # Create a new unique name by appending the suffix, reserving space for it
         unique_name = base_name[:15 - len(suffix_str)] + suffix_str
-        suffix += 1
+        if unique_name not in used_channel_names:
+            break
     
     # Add the new unique name to the set
     used_channel_names.add(unique_name)
@@ -221,19 +400,20 @@ def ham_band_check(frequency):
         freq_70cm_min <= frequency <= freq_70cm_max
     )
 
-def map_repeater_to_csv(repeater, map_data=None, no_location_lookup=False, additional_networks=None):
+def map_repeater_to_csv(repeater, no_location_lookup=False, additional_networks=None):
     """
-    Map repeater data to CSV format and optionally perform location lookup.
+    Map repeater data to CSV format and optionally queue a location lookup.
+
+    The location lookup itself is deferred: the returned row is queued in
+    pending_location_lookups and filled in later by resolve_locations().
 
     Args:
         repeater (dict): The dictionary containing repeater details.
         no_location_lookup (bool): If True, location lookup is disabled (latitude and longitude will be set to 0).
-        additional_networks (list): A list of additional networks to match.
+        additional_networks (frozenset): Lowercased names of additional networks to match.
     """
-    use_location = 'No'
-    roaming = 'No'
     if additional_networks is None:
-        additional_networks = []
+        additional_networks = frozenset()
 
     # Ensure that the repeater is a dictionary
     if not isinstance(repeater, dict):
@@ -255,77 +435,97 @@ def map_repeater_to_csv(repeater, map_data=None, no_location_lookup=False, addit
     if not ham_band_check(tx_frequency):
         print(f"Warning: tx frequency {tx_frequency} MHz for repeater {channel_name} is not within the 2m, 2.25m, or 70cm amateur radio bands. Dropping record.")
         return None
-    # Skip if network does not contain 'bm', 'bran', 'tgif', 'adn', or 'dmr', 
+    # Skip if network does not contain 'bm', 'bran', 'tgif', 'adn', or 'dmr-plus',
     # and if it's not in additional networks
-    if (
-        'bm' not in network and 'bran' not in network and 'tgif' not in network and 'adn' not in network and 'dmr-plus' not in network 
-        and network not in [n.lower() for n in additional_networks]
-    ):
+    default_networks = NET_RE.findall(network)
+    if not default_networks and network not in additional_networks:
         print(f"Skipping repeater due to non-matching network: {network}")
         return None
+    is_bm = any(match in ('bm', 'bran') for match in default_networks)
     
     # Get the state for the repeater
     state = repeater.get('State', 'Unknown')
     # Add the channel name to the list of the corresponding state
     channels_by_state[state].append(channel_name)
     # if we have additional networks add the channels here
-    if network in [n.lower() for n in additional_networks]:
+    if network in additional_networks:
            channels_by_network[network].append(channel_name)
     
+    if is_bm:
+        tg_list = 'BM'
+    else:
+        tg_list = network.upper()
+
+    row = _ROW_TEMPLATE.copy()
+    row['Channel Number'] = repeater.get('channel_number','')  # incremented
+    row['Channel Name'] = channel_name
+    row['Rx Frequency'] = rx_frequency
+    row['Tx Frequency'] = tx_frequency
+    row['Colour Code'] = repeater.get('ColorCode', '')
+    row['TG List'] = tg_list
     # Perform location lookup only if no_location_lookup is False
-    if no_location_lookup:
-        lat = 0
-        lon = 0
-    elif "bm" in network or 'bran' in network:    # only fetch repeater location if it is a Bm repeater
-        lat, lon = fetch_lat_long_with_api(radioid)
-        # If fetch_lat_long_with_api returns (0, 0), fall back to lookup_record_by_id
+    if not no_location_lookup:
+        pending_location_lookups.append((row, radioid, is_bm))
+    return row
+
+def lookup_location(radioid, is_bm, channel_name, marker_index, bm_index=None):
+    """
+    Find the location of a single repeater. BM repeaters are looked up in the
+    Brandmeister device index first, or on the Brandmeister API per repeater if
+    the index is unavailable or does not list it; everything else (or a BM miss)
+    uses the radioid map.
+
+    Returns:
+        tuple: (latitude, longitude), or (0, 0) if no location is known.
+    """
+    if is_bm:    # only fetch repeater location if it is a Bm repeater
+        lat, lon = 0, 0
+        if bm_index is None or str(radioid) not in bm_index:
+            # Not in the device list (or no list at all), ask the API for this repeater
+            lat, lon = fetch_lat_long_with_api(radioid)
+        elif bm_index[str(radioid)] is not None:
+            lat, lon = bm_index[str(radioid)]
+        # If the BM lookup returns (0, 0), fall back to lookup_record_by_id
         if lat == 0 and lon == 0:
             print(f"Warning: no location info found in BM servers for radioid {radioid}. Channel Name {channel_name} trying raioid map.")
-            lon, lat = lookup_record_by_id(radioid, map_data)
+            lon, lat = lookup_record_by_id(radioid, marker_index)
     else:
         # use radioid only
-        lon, lat = lookup_record_by_id(radioid, map_data)
-        
-# set use location flag
-    if lat != 0 and lon != 0:
-          use_location= 'Yes'
-          # temp fix for broken CPS
-          roaming = 'No'
-    if "bm" in network or 'brand' in network:
-        tg_list = 'BM'
-    else:
-        tg_list = network.upper()
-        
-    return {
-        'Channel Number': repeater.get('channel_number',''),  # incremented
-        'Channel Name': channel_name,
-        'Channel Type': 'Digital',  # Placeholder for now
-        'Rx Frequency': rx_frequency,
-        'Tx Frequency': tx_frequency,
-        'Bandwidth (kHz)': '',  # Not available in the API
-        'Colour Code': repeater.get('ColorCode', ''),
-        'Timeslot': '1', # always 1 for opendm77 as it is settable by keyboard
-        'Contact': 'None',  # Trustee as contact
-        'TG List': tg_list,  # Placeholder
-        'DMR ID': 'None',
-        'TS1_TA_Tx': 'APRS+Text',  # Placeholder
-        'TS2_TA_Tx ID': 'APRS+Text',  # Placeholder
-        'RX Tone': '',  # Placeholder
-        'TX Tone': '',  # Placeholder
-        'Squelch': '',  # Placeholder
-        'Power': 'Master',  # Placeholder
-        'Rx Only': 'No',  # Placeholder
-        'Zone Skip': 'No',  # Placeholder
-        'All Skip': 'No',  # Placeholder
-        'TOT': '0',  # Placeholder
-        'VOX': 'Off',  # Placeholder
-        'No Beep': 'No',  # Placeholder
-        'No Eco': 'No',  # Placeholder
-        'APRS': 'None',  # Placeholder
-        'Latitude': lat,  
-        'Longitude': lon,
-        'Use location': use_location
-    }
+        lon, lat = lookup_record_by_id(radioid, marker_index)
+    return lat, lon
+
+def resolve_locations(marker_index, max_workers=16):
+    """
+    Resolve every queued location lookup and store the results back into the
+    channel rows. BM locations come from a single Brandmeister device list
+    download; repeaters not listed in it (or all of them, if the download fails)
+    fall back to per-repeater API calls, which are run in a thread pool.
+
+    Args:
+        marker_index (dict): The radioid marker index used as a fallback.
+        max_workers (int): Number of concurrent lookups (default is 16).
+    """
+    global pending_location_lookups
+
+    # Only download the BM device list if there is a BM repeater to locate
+    bm_index = None
+    if any(is_bm for _, _, is_bm in pending_location_lookups):
+        bm_index = fetch_bm_device_index()
+
+    def lookup_one(pending):
+        row, radioid, is_bm = pending
+        return lookup_location(radioid, is_bm, row['Channel Name'], marker_index, bm_index)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        locations = list(executor.map(lookup_one, pending_location_lookups))
+
+    for (row, _, _), (lat, lon) in zip(pending_location_lookups, locations):
+        row['Latitude'] = lat
+        row['Longitude'] = lon
+        # set use location flag
+        if lat != 0 and lon != 0:
+            row['Use location'] = 'Yes'
+    pending_location_lookups = []
 
 
 # Function to map API data to CSV format
@@ -356,7 +556,7 @@ def fetch_repeaters(states=None, cities=None, countries=None):
     if countries:
         params.extend([('country', country) for country in countries])
     # Make the API request with the built parameters
-    response = requests.get(base_url, params=params)
+    response = SESSION.get(base_url, params=params, timeout=30)
 
     # Check if the response was successful
     if response.status_code == 200:
@@ -382,15 +582,14 @@ def format_repeater_data(data,chn):
     Args:
         api_response (str): JSON string of the API response.
 
-    Returns:
-        dict: A dictionary with the total count of repeaters and a list of formatted repeaters.
+    Yields:
+        dict: One formatted repeater at a time, so no intermediate list is built.
     """
     # Extract count and results
     total_count = data.get("count", 0)
     repeaters = data.get("results", [])
     
     # Format the repeater information
-    formatted_repeaters = []
     #initialize channel correctly
     chn -= 1
     for repeater in repeaters:
@@ -398,7 +597,7 @@ def format_repeater_data(data,chn):
         details = repeater.get("details", "")  # Get the 'details' field, default to an empty string
         details_clean = details.replace("<br>", "; ") if details else ""  # Only replace if details is not None or empty
         chn += 1
-        formatted_repeaters.append({
+        yield {
             "channel_number": chn,
             "id": repeater.get("id", "N/A"),
             "Callsign": repeater.get("callsign", "N/A"),
@@ -412,10 +611,7 @@ def format_repeater_data(data,chn):
             "Details": repeater.get("details", "N/A"),
             "ColorCode": repeater.get("color_code", "N/A"),
             "TimeSlotLinked": repeater.get("ts_linked", "N/A")
-        })
-    
-    # Return the formatted data
-    return formatted_repeaters
+        }
 
 # Main function to handle command-line arguments and run the program
 def main():
@@ -442,7 +638,8 @@ def main():
     cities = [city.strip() for city in args.cities.split(',')] if args.cities else []
     states = [state.strip() for state in args.states.split(',')] if args.states else []
     countries = [country.strip() for country in args.countries.split(',')] if args.countries else []
-    additional_networks = [network.strip() for network in args.additional_networks.split(',')] if args.additional_networks else []
+    # Additional networks are matched against lowercased network names, so lowercase them once here
+    additional_networks = frozenset(network.strip().lower() for network in args.additional_networks.split(',')) if args.additional_networks else frozenset()
 
     channel_file = args.channels
     zone_file = args.zones
@@ -452,25 +649,30 @@ def main():
         print("Error: At least one of --states, --cities, or --countries must be provided.")
         return
 # Call the function to download radioid map data
-    map_data = download_radioid_map()
-    if map_data is None:
+    marker_index = download_radioid_map()
+    if marker_index is None:
         print(f"Error: No valid JSON data loaded for the map.")
+        marker_index = {}
 # Fetch repeaters for the specified states
     repeaters = fetch_repeaters(states, cities, countries)
-# format repeaters into a dict
+# format repeaters into dicts, lazily as they are mapped
     repeater_objects = format_repeater_data(repeaters, seed_channel_number) 
 # Map the repeaters to the CSV format, filtering out None results
     mapped_data = [
-        map_repeater_to_csv(repeater, map_data, no_location_lookup=args.no_location_lookup, additional_networks=additional_networks)
-        for repeater in repeater_objects if repeater is not None
+        row for row in (
+            map_repeater_to_csv(repeater, no_location_lookup=args.no_location_lookup, additional_networks=additional_networks)
+            for repeater in repeater_objects
+        ) if row is not None
     ]
-#    print(mapped_data)
-    # Convert to a DataFrame
-    df = pd.DataFrame([r for r in mapped_data if r is not None])
-    print(df)    
+# Look up all repeater locations
+    resolve_locations(marker_index)
     # Write the data to a CSV file
-    df.to_csv(channel_file, index=False)
-    print(f"Data has been written to {channel_file}")
+    with open(channel_file, mode='w', newline='') as csvfile:
+        # Keep '\n' line endings rather than csv's default '\r\n'
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(mapped_data)
+    print(f"{len(mapped_data)} channels have been written to {channel_file}")
     write_zone_to_csv(zone_file)
     
 if __name__ == '__main__':